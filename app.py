@@ -1,15 +1,83 @@
+import csv
+import json
+import sys
+from collections import defaultdict
+from functools import lru_cache
 import pandas as pd
-from flask import Flask, jsonify, request, abort
+from flask import Flask, Response, request, abort
+from flask.json.provider import DefaultJSONProvider
 import os
+import orjson
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+
+try:
+    from numba import njit, prange, types
+    from numba.extending import intrinsic
+    NUMBA_DISPONIBLE = True
+except ImportError:
+    NUMBA_DISPONIBLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_DISPONIBLE = True
+except ImportError:
+    AHOCORASICK_DISPONIBLE = False
+
+ARCHIVO_CSV = "fra_perfumes.csv"
+
+# Archivos de cache de arranque: evitan re-parsear el CSV y recalcular las
+# estructuras derivadas (notas, vocabulario, matriz de vectores) en cada
+# arranque de proceso/worker
+CACHE_PARQUET = "fra_perfumes.parquet"
+CACHE_VECTORES = "vectors.npz"
+CACHE_META = "fra_perfumes.cache.json"
+CACHE_VERSION = 3
+
+def detectar_formato_csv(archivo):
+    """Detecta codificación y dialecto del CSV a partir de una muestra.
+
+    Evita los reintentos a ciegas: una sola pasada de charset_normalizer
+    sobre 64 KB más csv.Sniffer determinan encoding/separador/quoting.
+    """
+    with open(archivo, 'rb') as f:
+        muestra = f.read(65536)
+
+    from charset_normalizer import from_bytes
+    candidatos = [m.encoding for m in from_bytes(muestra)]
+    # Las codificaciones de un byte son ambiguas entre sí: preferir las
+    # habituales si están entre los candidatos plausibles
+    for enc in ('utf_8', 'cp1252', 'latin_1'):
+        if enc in candidatos:
+            encoding = enc
+            break
+    else:
+        encoding = candidatos[0] if candidatos else 'latin1'
+
+    dialecto = csv.Sniffer().sniff(
+        muestra.decode(encoding, errors='replace'), delimiters=';,\t'
+    )
+    return encoding, dialecto
+
 
 # Función mejorada para cargar el CSV con validación de archivo
 def cargar_csv():
-    archivo = "fra_perfumes.csv"
+    archivo = ARCHIVO_CSV
     if not os.path.exists(archivo):
         raise FileNotFoundError(f"El archivo {archivo} no se encuentra en el directorio actual")
 
+    # Ruta rápida: dialecto detectado una vez + lector multihilo de pyarrow
+    try:
+        encoding, dialecto = detectar_formato_csv(archivo)
+        return pd.read_csv(
+            archivo,
+            sep=dialecto.delimiter,
+            quotechar=dialecto.quotechar,
+            encoding=encoding,
+            engine='pyarrow'
+        )
+    except Exception as e:
+        print(f"Lectura con pyarrow fallida, se prueban configuraciones: {e}")
+
     configuraciones = [
         {"sep": ";", "encoding": "latin1"},
         {"sep": ",", "encoding": "latin1", "quotechar": '"'},
@@ -28,24 +96,288 @@ def cargar_csv():
     raise Exception("No se pudo cargar el CSV con ninguna configuración probada")
 
 
-# Cargar el DataFrame
-try:
-    df = cargar_csv()
-    print("CSV cargado exitosamente")
-    print(f"Dimensiones del DataFrame: {df.shape}")
-except Exception as e:
-    print(f"Error critico al cargar el CSV: {e}")
-    exit(1)
-
-# Crear columna combinada de main_accords
-main_cols = [c for c in df.columns if c.lower().startswith("mainaccord")]
-if main_cols:
-    df['main_accords'] = df[main_cols].apply(
-        lambda row: [str(v) for v in row if pd.notna(v) and str(v).strip() != ''],
-        axis=1
+def _firma_csv():
+    stat = os.stat(ARCHIVO_CSV)
+    return {"version": CACHE_VERSION, "mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def cargar_desde_cache():
+    """Intenta cargar df/VOCAB/MATRIZ_VECTORES desde la cache en disco.
+
+    Devuelve (df, vocab, matriz) o None si la cache no existe o no
+    corresponde al CSV actual.
+    """
+    try:
+        if not (os.path.exists(CACHE_PARQUET) and os.path.exists(CACHE_VECTORES)
+                and os.path.exists(CACHE_META)):
+            return None
+        with open(CACHE_META) as f:
+            meta = json.load(f)
+        if meta != _firma_csv():
+            return None
+
+        df_cache = pd.read_parquet(CACHE_PARQUET, engine="pyarrow")
+        # Parquet devuelve las columnas de listas como arrays; normalizar a
+        # list y reconstruir los frozensets internados de notas/acordes
+        if "main_accords" in df_cache.columns:
+            df_cache["main_accords"] = df_cache["main_accords"].map(list)
+        for col in ("main_accords_lower", "todas_notas"):
+            if col in df_cache.columns:
+                df_cache[col] = df_cache[col].map(
+                    lambda xs: frozenset(sys.intern(str(s)) for s in xs)
+                )
+
+        datos = np.load(CACHE_VECTORES, allow_pickle=False)
+        return df_cache, list(datos["vocab"]), datos["mat"]
+    except Exception as e:
+        print(f"Cache inválida, se reconstruye desde el CSV: {e}")
+        return None
+
+
+def guardar_cache(df, vocab, matriz):
+    try:
+        # Parquet no serializa frozensets: volcarlos como listas
+        df_out = df.copy()
+        for col in ("main_accords_lower", "todas_notas"):
+            if col in df_out.columns:
+                df_out[col] = df_out[col].map(list)
+        df_out.to_parquet(CACHE_PARQUET, engine="pyarrow")
+        np.savez_compressed(CACHE_VECTORES, mat=matriz, vocab=np.array(vocab))
+        with open(CACHE_META, "w") as f:
+            json.dump(_firma_csv(), f)
+        print("Cache de arranque guardada")
+    except Exception as e:
+        print(f"No se pudo guardar la cache de arranque: {e}")
+
+
+def construir_todas_notas(df):
+    """Construye main_accords_lower y todas_notas con operaciones
+    vectorizadas de pandas en lugar de df.apply fila a fila.
+
+    Ambas columnas quedan como frozenset de strings internados: el intern
+    deduplica las notas repetidas entre filas y la pertenencia es un
+    lookup de hash en lugar de comparar strings.
+    """
+    accords_lower = df['main_accords'].map(
+        lambda xs: [sys.intern(str(x).lower()) for x in xs]
+    )
+
+    def notas_de_columna(col):
+        if col not in df.columns:
+            return pd.Series([[]] * len(df), index=df.index)
+        partes = df[col].fillna('').astype(str).str.lower().str.split(',')
+        return partes.map(lambda xs: [s.strip() for s in xs if s.strip()])
+
+    combinadas = (notas_de_columna('salida') + notas_de_columna('corazon')
+                  + notas_de_columna('base') + accords_lower)
+    df['todas_notas'] = combinadas.map(
+        lambda xs: frozenset(sys.intern(s) for s in xs)
     )
+    df['main_accords_lower'] = accords_lower.map(frozenset)
+
+
+def construir_matriz_vectores(todas_notas, vocab):
+    """Matriz binaria perfume × nota en uint8 (las entradas son 0/1, así
+    que int64 desperdiciaría 8× memoria y ancho de banda)."""
+    vocab_idx = {n: i for i, n in enumerate(vocab)}
+    mat = np.zeros((len(todas_notas), len(vocab)), dtype=np.uint8)
+    for i, notas in enumerate(todas_notas):
+        mat[i, [vocab_idx[n] for n in notas if n in vocab_idx]] = 1
+    return mat
+
+
+# Cargar el DataFrame (desde cache si está vigente, si no desde el CSV)
+_cache = cargar_desde_cache()
+if _cache is not None:
+    df, VOCAB, MATRIZ_VECTORES = _cache
+    print("Cache de arranque cargada exitosamente")
+    print(f"Dimensiones del DataFrame: {df.shape}")
 else:
-    df['main_accords'] = [[] for _ in range(len(df))]
+    try:
+        df = cargar_csv()
+        print("CSV cargado exitosamente")
+        print(f"Dimensiones del DataFrame: {df.shape}")
+    except Exception as e:
+        print(f"Error critico al cargar el CSV: {e}")
+        exit(1)
+
+    # Crear columna combinada de main_accords (enmascarado numpy por
+    # columnas en lugar de un apply fila a fila)
+    main_cols = [c for c in df.columns if c.lower().startswith("mainaccord")]
+    if main_cols:
+        arr = df[main_cols].to_numpy(dtype=object)
+        validos = pd.notna(arr) & (np.char.strip(arr.astype('U')) != '')
+        df['main_accords'] = [list(arr[i, validos[i]]) for i in range(len(arr))]
+    else:
+        df['main_accords'] = [[] for _ in range(len(df))]
+
+    construir_todas_notas(df)
+
+    # Vocabulario global
+    VOCAB = sorted({n for notas in df['todas_notas'] for n in notas})
+
+    MATRIZ_VECTORES = construir_matriz_vectores(df['todas_notas'], VOCAB)
+
+    guardar_cache(df, VOCAB, MATRIZ_VECTORES)
+
+# Columnas de baja cardinalidad como category: la memoria baja en
+# proporción a únicos/total y los filtros comparan códigos enteros en C
+CATEGORICAS = [col for col in ('genero', 'marca', 'año') if col in df.columns]
+for _col in CATEGORICAS:
+    df[_col] = df[_col].astype('category')
+
+# Normas precomputadas para el coseno: para vectores binarios,
+# cos(a, b) = (a · b) / (‖a‖ · ‖b‖) con ‖a‖ = sqrt(sum(a))
+NORMS = np.sqrt(MATRIZ_VECTORES.sum(axis=1, dtype=np.float32))
+# Filas sin notas tendrían norma 0: fijarla a 1 en el arranque evita
+# proteger cada división con un epsilon por petición
+NORMS[NORMS == 0] = 1
+
+# Kernel Numba opcional: la matriz binaria empaquetada en palabras de 64
+# bits permite calcular el producto punto con popcount (una instrucción
+# POPCNT por palabra) repartido entre núcleos, en lugar del matmul BLAS
+if NUMBA_DISPONIBLE:
+    @intrinsic
+    def _popcount64(typingctx, src):
+        sig = types.uint64(types.uint64)
+
+        def codegen(context, builder, signature, args):
+            return builder.ctpop(args[0])
+
+        return sig, codegen
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _similitudes_packed(packed, base, normas, norma_base):
+        n, w = packed.shape
+        out = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            inter = np.uint64(0)
+            for j in range(w):
+                inter += _popcount64(packed[i, j] & base[j])
+            out[i] = inter / (normas[i] * norma_base)
+        return out
+
+    _pad = (-MATRIZ_VECTORES.shape[1]) % 64
+    MATRIZ_PACKED = np.ascontiguousarray(
+        np.packbits(np.pad(MATRIZ_VECTORES, ((0, 0), (0, _pad))), axis=1)
+    ).view(np.uint64)
+
+    # Warm-up: compilar el kernel en el arranque y no en la primera petición
+    _similitudes_packed(MATRIZ_PACKED, MATRIZ_PACKED[0], NORMS, NORMS[0])
+
+
+def calcular_similitudes(idx_base):
+    """Similitud coseno de idx_base contra todos los perfumes."""
+    if NUMBA_DISPONIBLE:
+        return _similitudes_packed(MATRIZ_PACKED, MATRIZ_PACKED[idx_base],
+                                   NORMS, NORMS[idx_base])
+    return (MATRIZ_VECTORES @ MATRIZ_VECTORES[idx_base].astype(np.float32)) \
+        / (NORMS * NORMS[idx_base])
+
+
+def construir_indice_invertido(listas):
+    """Índice invertido valor → array de índices de fila (posting list)."""
+    indice = defaultdict(list)
+    for i, valores in enumerate(listas):
+        for v in valores:
+            indice[v].append(i)
+    return {clave: np.array(ids, dtype=np.int64) for clave, ids in indice.items()}
+
+
+# Índices invertidos de notas y acordes: la búsqueda AND se resuelve
+# intersectando posting lists en lugar de escanear todas las filas
+NOTE_INDEX = construir_indice_invertido(df['todas_notas'])
+ACORDE_INDEX = construir_indice_invertido(df['main_accords_lower'])
+
+
+# Series en minúsculas cacheadas por columna filtrable: el astype(str)
+# por petición copiaba la columna entera en cada búsqueda. Para las
+# columnas categóricas basta con la lista de categorías en minúsculas:
+# el filtro escanea esa lista diminuta y termina en un isin de códigos.
+COLUMNAS_FILTRABLES = ['marca', 'genero', 'perfume', 'perfumista', 'año']
+CATS_LOWER = {col: df[col].cat.categories.astype('string').str.lower()
+              for col in CATEGORICAS}
+LOWER = {col: df[col].astype('string').str.lower()
+         for col in COLUMNAS_FILTRABLES
+         if col in df.columns and col not in CATS_LOWER}
+
+# Lookup O(1) de nombre exacto → fila para /perfumes/similares; la
+# búsqueda por subcadena queda como fallback sobre la Series cacheada
+NAME_TO_IDX = {str(v).lower(): i for i, v in enumerate(df['perfume'])}
+
+
+def mascara_contiene(columna, valor):
+    """Máscara booleana de filas cuya columna contiene valor (subcadena)."""
+    valor = valor.lower()
+    if columna in CATS_LOWER:
+        hits = CATS_LOWER[columna].str.contains(valor, regex=False, na=False)
+        categorias = df[columna].cat.categories[np.asarray(hits, dtype=bool)]
+        return df[columna].isin(categorias).to_numpy(dtype=bool)
+    return LOWER[columna].str.contains(valor, regex=False, na=False).to_numpy(dtype=bool)
+
+
+@lru_cache(maxsize=256)
+def _automa_terminos(terminos):
+    automa = ahocorasick.Automaton()
+    for i, termino in enumerate(terminos):
+        automa.add_word(termino, i)
+    automa.make_automaton()
+    return automa
+
+
+def _postings_por_subcadena(indice, terminos):
+    """Posting lists de términos sin clave exacta en el índice.
+
+    Con pyahocorasick cada clave del índice se escanea una sola vez para
+    todos los términos a la vez (un autómata por tupla de términos,
+    cacheado); sin él se cae al bucle subcadena-por-término.
+    """
+    terminos = tuple(terminos)
+    resultado = {t: [] for t in terminos}
+    if AHOCORASICK_DISPONIBLE:
+        automa = _automa_terminos(terminos)
+        for clave, ids in indice.items():
+            for v in {v for _, v in automa.iter(clave)}:
+                resultado[terminos[v]].append(ids)
+    else:
+        for clave, ids in indice.items():
+            for t in terminos:
+                if t in clave:
+                    resultado[t].append(ids)
+    return resultado
+
+
+def buscar_en_indice(indice, terminos):
+    """Intersección (modo AND) de las posting lists de los términos.
+
+    Si un término no existe como clave exacta, se unen las posting lists
+    de las claves que lo contienen como subcadena.
+    """
+    postings = []
+    pendientes = []
+    for termino in terminos:
+        ids = indice.get(termino)
+        if ids is None:
+            pendientes.append(termino)
+        else:
+            postings.append(ids)
+
+    if pendientes:
+        parciales = _postings_por_subcadena(indice, pendientes)
+        for termino in pendientes:
+            listas = parciales[termino]
+            if not listas:
+                return np.empty(0, dtype=np.int64)
+            postings.append(np.unique(np.concatenate(listas)))
+
+    # Intersectar empezando por la lista más corta
+    postings.sort(key=len)
+    resultado = postings[0]
+    for ids in postings[1:]:
+        if resultado.size == 0:
+            break
+        resultado = np.intersect1d(resultado, ids, assume_unique=True)
+    return resultado
 
 # Campos a exponer en la API
 CAMPOS_VALIDOS = [
@@ -56,8 +388,33 @@ CAMPOS_DISPONIBLES = [campo for campo in CAMPOS_VALIDOS if campo in df.columns]
 
 print("Columnas disponibles en la API:", CAMPOS_DISPONIBLES)
 
+# Proveedor JSON basado en orjson (mucho más rápido que json.dumps para
+# respuestas grandes como /perfumes y /perfumes/search)
+def _orjson_default(obj):
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Tipo no serializable: {type(obj)}")
+
+def orjson_dumps(obj):
+    return orjson.dumps(
+        obj,
+        default=_orjson_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+
+class OrjsonProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson_dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 # Crear la aplicación Flask
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # ------------------------
 # Funciones auxiliares
@@ -65,29 +422,41 @@ app = Flask(__name__)
 def filtrar_campos(df_sub):
     return df_sub[CAMPOS_DISPONIBLES]
 
-def extraer_notas(row):
-    notas = []
-    for campo in ['salida', 'corazon', 'base']:
-        if campo in df.columns and pd.notna(row.get(campo, None)):
-            notas += [n.strip().lower() for n in str(row[campo]).split(',')]
-    if 'main_accords' in row and isinstance(row['main_accords'], list):
-        notas += [str(n).lower() for n in row['main_accords']]
-    return list(set(notas))
-
-df['todas_notas'] = df.apply(extraer_notas, axis=1)
-
-# Vocabulario global
-VOCAB = sorted({n for notas in df['todas_notas'] for n in notas})
-
-def vectorizar_notas(notas, vocab):
-    return [1 if n in notas else 0 for n in vocab]
+def json_response(datos):
+    """Respuesta JSON directa desde bytes de orjson: evita el recorrido
+    de jsonify y sus defaults de pretty-print/sort_keys."""
+    if not isinstance(datos, bytes):
+        datos = orjson_dumps(datos)
+    return Response(datos, mimetype='application/json', direct_passthrough=True)
 
-MATRIZ_VECTORES = np.array([vectorizar_notas(notas, VOCAB) for notas in df['todas_notas']])
+# Lista de dicts ya filtrados, materializada una sola vez: to_dict por
+# petición reconstruía los mismos dicts fila a fila en cada llamada
+RECORDS = filtrar_campos(df).to_dict(orient='records')
 
 # ------------------------
 # Endpoints
 # ------------------------
 
+# df es inmutable en runtime, así que las páginas ya serializadas se
+# pueden cachear por (pagina, por_pagina) y devolver los bytes directamente
+@lru_cache(maxsize=256)
+def _render_pagina(pagina, por_pagina):
+    inicio = (pagina - 1) * por_pagina
+    fin = inicio + por_pagina
+
+    return orjson_dumps({
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'total': len(RECORDS),
+        'perfumes': RECORDS[inicio:fin]
+    })
+
+
+@lru_cache(maxsize=4096)
+def _render_perfume(perfume_id):
+    return orjson_dumps(RECORDS[perfume_id])
+
+
 @app.route('/perfumes', methods=['GET'])
 def get_perfumes():
     try:
@@ -97,18 +466,7 @@ def get_perfumes():
         if pagina < 1 or por_pagina < 1:
             abort(400, description="Los parámetros de paginación deben ser positivos")
 
-        inicio = (pagina - 1) * por_pagina
-        fin = inicio + por_pagina
-
-        subset = df.iloc[inicio:fin]
-        perfumes = filtrar_campos(subset).to_dict(orient='records')
-
-        return jsonify({
-            'pagina': pagina,
-            'por_pagina': por_pagina,
-            'total': len(df),
-            'perfumes': perfumes
-        })
+        return json_response(_render_pagina(pagina, por_pagina))
     except ValueError:
         abort(400, description="Parámetros de paginación inválidos")
 
@@ -118,49 +476,39 @@ def get_perfume(perfume_id):
     if perfume_id < 0 or perfume_id >= len(df):
         abort(404, description=f"Perfume ID {perfume_id} no encontrado. El rango válido es 0-{len(df) - 1}")
 
-    perfume = filtrar_campos(df.iloc[[perfume_id]]).iloc[0].to_dict()
-    return jsonify(perfume)
+    return json_response(_render_perfume(perfume_id))
 
 
 @app.route('/perfumes/search', methods=['GET'])
 def search_perfumes():
     try:
-        query = df.copy()
-        filtros_texto = {
-            'marca': 'marca',
-            'genero': 'genero',
-            'perfume': 'perfume',
-            'perfumista': 'perfumista',
-            'año': 'año'
-        }
-
-        # --- Filtros básicos (marca, genero, etc) ---
-        for param, columna in filtros_texto.items():
-            valor = request.args.get(param)
-            if valor and columna in query.columns:
-                query = query[query[columna].astype(str).str.contains(valor, case=False, na=False)]
-
-        # --- Buscar por varias notas (modo AND) ---
+        # --- Filtros básicos (marca, genero, etc) como máscaras booleanas ---
+        mask = np.ones(len(df), dtype=bool)
+        for columna in COLUMNAS_FILTRABLES:
+            valor = request.args.get(columna)
+            if valor and (columna in LOWER or columna in CATS_LOWER):
+                mask &= mascara_contiene(columna, valor)
+
+        # --- Buscar por varias notas (modo AND, vía índice invertido) ---
         notas_param = request.args.get('nota')
         if notas_param:
             notas_buscar = [n.strip().lower() for n in notas_param.split(",") if n.strip()]
+            if notas_buscar:
+                sub_mask = np.zeros(len(df), dtype=bool)
+                sub_mask[buscar_en_indice(NOTE_INDEX, notas_buscar)] = True
+                mask &= sub_mask
 
-            def contiene_todas(row):
-                notas_perfume = extraer_notas(row)
-                return all(n in notas_perfume for n in notas_buscar)
-
-            query = query[query.apply(contiene_todas, axis=1)]
-
-        # --- Buscar por varios acordes (modo AND) ---
+        # --- Buscar por varios acordes (modo AND, vía índice invertido) ---
         acordes_param = request.args.get('acorde')
-        if acordes_param and 'main_accords' in query.columns:
+        if acordes_param:
             acordes_buscar = [a.strip().lower() for a in acordes_param.split(",") if a.strip()]
+            if acordes_buscar:
+                sub_mask = np.zeros(len(df), dtype=bool)
+                sub_mask[buscar_en_indice(ACORDE_INDEX, acordes_buscar)] = True
+                mask &= sub_mask
 
-            def contiene_todos_acordes(acordes):
-                acordes_lower = [str(a).lower() for a in acordes]
-                return all(a in acordes_lower for a in acordes_buscar)
-
-            query = query[query['main_accords'].apply(contiene_todos_acordes)]
+        # Una única selección al final con la máscara acumulada
+        query = df.iloc[np.flatnonzero(mask)]
 
         # --- Ordenar resultados ---
         orden = request.args.get('orden')
@@ -169,7 +517,7 @@ def search_perfumes():
             query = query.sort_values(by=orden, ascending=ascendente)
 
         resultados = filtrar_campos(query).to_dict(orient='records')
-        return jsonify({
+        return json_response({
             'total_resultados': len(resultados),
             'parametros_busqueda': {
                 'nota': notas_param,
@@ -193,45 +541,53 @@ def get_similares_nombre():
     if not nombre:
         abort(400, description="Debes proporcionar el parámetro 'nombre'")
 
-    coincidencias = df[df['perfume'].astype(str).str.contains(nombre, case=False, na=False)]
-    if coincidencias.empty:
-        abort(404, description=f"No se encontró ningún perfume que coincida con '{nombre}'")
-
-    # Tomar el primer match
-    idx_base = coincidencias.index[0]
-    base_vec = MATRIZ_VECTORES[idx_base].reshape(1, -1)
-
-    similitudes = cosine_similarity(base_vec, MATRIZ_VECTORES)[0]
-    df['score_similaridad'] = similitudes
-
-    similares = df[df.index != idx_base].sort_values('score_similaridad', ascending=False)
-
+    # Match exacto en O(1); si falla, primer match por subcadena
+    nombre_lower = nombre.lower()
+    idx_base = NAME_TO_IDX.get(nombre_lower)
+    if idx_base is None:
+        coincide = LOWER['perfume'].str.contains(
+            nombre_lower, regex=False, na=False
+        ).to_numpy(dtype=bool)
+        if not coincide.any():
+            abort(404, description=f"No se encontró ningún perfume que coincida con '{nombre}'")
+        idx_base = int(np.flatnonzero(coincide)[0])
+
+    similitudes = calcular_similitudes(idx_base)
+
+    # Top-n con argpartition (O(N + k log k)) en lugar de ordenar todo el
+    # DataFrame; similitudes es local, no se escribe nada en df
     top_n = int(request.args.get('n', 10))
-    similares = similares.head(top_n)
-
-    # Convertir score a porcentaje
-    similares_out = filtrar_campos(similares).copy()
-    similares_out['similitud'] = (similares['score_similaridad'] * 100).round(1).astype(str) + "%"
-
-    return jsonify({
-        'base': filtrar_campos(df.iloc[[idx_base]]).iloc[0].to_dict(),
-        'similares': similares_out.to_dict(orient='records')
+    similitudes[idx_base] = -np.inf
+    k = min(top_n, len(similitudes) - 1)
+    top_idx = np.argpartition(-similitudes, k)[:k]
+    top_idx = top_idx[np.argsort(-similitudes[top_idx])]
+
+    # Convertir score a porcentaje sobre los dicts ya materializados
+    similares = [RECORDS[i] | {'similitud': f"{similitudes[i] * 100:.1f}%"}
+                 for i in top_idx]
+
+    return json_response({
+        'base': RECORDS[idx_base],
+        'similares': similares
     })
 
 
 # Manejadores de error
 @app.errorhandler(404)
 def no_encontrado(error):
-    return jsonify({'error': str(error)}), 404
+    return json_response({'error': str(error)}), 404
 
 @app.errorhandler(400)
 def solicitud_incorrecta(error):
-    return jsonify({'error': str(error)}), 400
+    return json_response({'error': str(error)}), 400
 
 @app.errorhandler(500)
 def error_interno(error):
-    return jsonify({'error': str(error)}), 500
+    return json_response({'error': str(error)}), 500
 
-# Main
+# Main (desarrollo; en producción: gunicorn -c gunicorn_conf.py app:app)
+# Sin reloader: el doble arranque de Werkzeug construiría dos veces toda
+# la preparación de datos (CSV, matriz, índices)
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0',
+            port=5000, use_reloader=False)
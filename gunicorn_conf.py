@@ -0,0 +1,13 @@
+import os
+
+# Producción: gunicorn -c gunicorn_conf.py app:app
+#
+# Con preload_app la app se importa una sola vez en el proceso padre:
+# el parseo del CSV, MATRIZ_VECTORES, RECORDS y los índices invertidos
+# se construyen una vez y los workers los heredan por copy-on-write
+# (ninguna petición escribe sobre ese estado compartido).
+bind = "0.0.0.0:5000"
+workers = os.cpu_count()
+worker_class = "gthread"
+threads = 4
+preload_app = True